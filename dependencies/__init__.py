@@ -1,18 +1,26 @@
 from .dependencies import (
     Dependent,
+    DependencyTimeout,
     Depends,
+    Hedge,
+    Lazy,
     builder,
     decorator,
     get_dependent,
     solve_dependent,
 )
+from .incremental import IncrementalSession
 
 # VERSION = '2.6.0'
 __version__ = "0.1.0"
 
 __all__ = (
     "Dependent",
+    "DependencyTimeout",
     "Depends",
+    "Hedge",
+    "IncrementalSession",
+    "Lazy",
     "builder",
     "decorator",
     "get_dependent",
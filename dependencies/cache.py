@@ -0,0 +1,360 @@
+"""Result cache shared by worker processes through a memory-mapped file
+
+config = SharedCache("/dev/shm/myapp.cache")
+
+def get_config(settings: Annotated[Config, Depends(parse_config, cache=config)]):
+    ...
+"""
+
+import errno
+import fcntl
+import hashlib
+import inspect
+import mmap
+import os
+import pickle
+import struct
+import threading
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+import anyio
+
+MAGIC = b"DEPCACHE"
+# magic, slots, capacity, tail, clock
+HEADER = struct.Struct("<8sQQQQ")
+# digest, offset, length, used, flags
+ENTRY = struct.Struct("<16sQQQI4x")
+WAYS = 8
+# fcntl locks of the fills, beyond the end of any mapping
+FILL_LOCKS = 1 << 48
+
+VALID = 1
+# bytes value, stored as is
+RAW = 2
+
+
+def stable_key(key: Hashable) -> bytes:
+    """digest of make_key's result which is the same in every process
+
+    Functions are identified by their module and qualified name, the ones which
+    can't be told apart this way (closures, lambdas, methods bound to an
+    instance) and the values whose repr is an address are rejected: they would
+    share an entry with another object, or never match in another process.
+    """
+
+    def encode(part: Any) -> str:
+        if isinstance(part, tuple):
+            return "(" + ",".join(encode(item) for item in part) + ")"
+        if inspect.ismethod(part):
+            if not inspect.isclass(part.__self__):
+                raise TypeError(f"{part} is bound to an instance, it has no stable key")
+            return f"{encode(part.__self__)}.{part.__name__}"
+        if callable(part) and hasattr(part, "__qualname__"):
+            qualname = part.__qualname__
+            if "<locals>" in qualname or "<lambda>" in qualname:
+                raise TypeError(f"{part} is not defined at module level")
+            return f"{part.__module__}.{qualname}"
+        text = repr(part)
+        if " at 0x" in text:
+            raise TypeError(f"the repr of {text} is an address")
+        return text
+
+    return hashlib.blake2b(encode(key).encode(), digest_size=16).digest()
+
+
+class SharedCache:
+    """Size bounded cache of serialized results in a memory-mapped file
+
+    Entries are placed in an 8-way set associative table, evicted by LRU inside
+    a set, their data is written to a ring buffer of `capacity` bytes which
+    evicts the oldest data when it wraps around.
+
+    `fill` is single-flight across processes and tasks: only one of them
+    resolves a missing key, the others wait in the event loop (cancellable,
+    without a thread) and read its result.
+
+    Results are copied out of the mapping. `view` gives a zero-copy read-only
+    view of a bytes result instead, its data is not overwritten until the
+    `with` block exits. Results which can't be unpickled any more, e.g. after a
+    class was renamed, are missing.
+
+    Keys are the result of the dependent's `make_key`, which ignores args by
+    default: every input of a dependent shares one entry. See `stable_key` for
+    the calls which can be keys.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        capacity: int = 64 * 1024 * 1024,
+        slots: int = 1024,
+    ) -> None:
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.lock = threading.Lock()
+        self.fill_locks: Dict[bytes, anyio.Lock] = {}
+        # data ranges viewed by this process, fcntl locks can't tell them apart
+        self.pinned: Counter[Tuple[int, int]] = Counter()
+        with self.locked():
+            header = os.pread(self.fd, HEADER.size, 0)
+            if len(header) == HEADER.size and header[:8] == MAGIC:
+                # created by another process, its layout wins
+                _, slots, capacity, _, _ = HEADER.unpack(header)
+            else:
+                slots = max(slots // WAYS, 1) * WAYS
+                os.ftruncate(self.fd, HEADER.size + slots * ENTRY.size + capacity)
+                os.pwrite(self.fd, HEADER.pack(MAGIC, slots, capacity, 0, 0), 0)
+            self.slots = slots
+            self.capacity = capacity
+            self.arena = HEADER.size + slots * ENTRY.size
+            self.mm = mmap.mmap(self.fd, self.arena + capacity)
+
+    def close(self) -> None:
+        self.mm.close()
+        os.close(self.fd)
+
+    def __enter__(self) -> "SharedCache":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def locked(self) -> "_TableLock":
+        return _TableLock(self)
+
+    def header(self) -> Tuple[int, int]:
+        """tail, clock"""
+        _, _, _, tail, clock = HEADER.unpack_from(self.mm, 0)
+        return tail, clock
+
+    def set_header(self, tail: int, clock: int) -> None:
+        HEADER.pack_into(self.mm, 0, MAGIC, self.slots, self.capacity, tail, clock)
+
+    def entries(self, digest: bytes) -> range:
+        sets = self.slots // WAYS
+        first = int.from_bytes(digest[:8], "little") % sets * WAYS
+        return range(first, first + WAYS)
+
+    def entry_offset(self, index: int) -> int:
+        return HEADER.size + index * ENTRY.size
+
+    def find(self, digest: bytes) -> Optional[Tuple[int, int, int]]:
+        """offset, length and flags of digest, marked as recently used"""
+        for index in self.entries(digest):
+            key, offset, length, _, flags = ENTRY.unpack_from(
+                self.mm, self.entry_offset(index)
+            )
+            if flags & VALID and key == digest:
+                tail, clock = self.header()
+                ENTRY.pack_into(
+                    self.mm, self.entry_offset(index), key, offset, length, clock, flags
+                )
+                self.set_header(tail, clock + 1)
+                return offset, length, flags
+        return None
+
+    def lookup(self, digest: bytes) -> Tuple[bool, Any]:
+        with self.locked():
+            found = self.find(digest)
+            if found is None:
+                return False, None
+            offset, length, flags = found
+            start = self.arena + offset
+            data = self.mm[start : start + length]
+        if flags & RAW:
+            return True, data
+        # unpickled without the lock, it may be large
+        try:
+            return True, pickle.loads(data)
+        except Exception:
+            # e.g. stored before a class was renamed, resolved and stored again
+            return False, None
+
+    @contextmanager
+    def view(self, key: Hashable) -> Iterator[Optional[memoryview]]:
+        """zero-copy read-only view of a bytes result, None if it is missing
+
+        with cache.view((parse_config, "config")) as data:
+            ...
+        """
+        with self.locked():
+            found = self.find(stable_key(key))
+            if found is not None:
+                offset, length, flags = found
+                if not flags & RAW:
+                    raise TypeError(f"{key} is not a bytes result")
+                start = self.arena + offset
+                # the other processes don't overwrite a range locked for reading
+                fcntl.lockf(self.fd, fcntl.LOCK_SH, length, start)
+                self.pinned[(offset, length)] += 1
+        if found is None:
+            # outside of the table lock, the block may use the cache
+            yield None
+            return
+        try:
+            with memoryview(self.mm) as mapping:
+                with mapping[start : start + length].toreadonly() as data:
+                    yield data
+        finally:
+            with self.locked():
+                self.pinned[(offset, length)] -= 1
+                if not self.pinned[(offset, length)]:
+                    del self.pinned[(offset, length)]
+                    fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+
+    def writable(self, start: int, end: int) -> bool:
+        """lock [start, end) of the arena for writing, unless it is viewed"""
+        if start == end:
+            return True
+        if any(
+            offset < end and start < offset + length for offset, length in self.pinned
+        ):
+            return False
+        try:
+            fcntl.lockf(
+                self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB, end - start, self.arena + start
+            )
+        except OSError as e:
+            if e.errno not in (errno.EACCES, errno.EAGAIN):  # pragma: no cover
+                raise
+            return False
+        return True
+
+    def store(self, digest: bytes, value: Any) -> None:
+        flags = VALID
+        if type(value) is bytes:
+            data = value
+            flags |= RAW
+        else:
+            try:
+                data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                # not shareable, keep it local
+                return
+        length = len(data)
+        if length > self.capacity:
+            return
+        with self.locked():
+            tail, clock = self.header()
+            if tail + length > self.capacity:
+                tail = 0
+            if not self.writable(tail, tail + length):
+                # viewed, keep the result local
+                return
+            self.evict(tail, tail + length)
+            self.mm[self.arena + tail : self.arena + tail + length] = data
+            if length:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, length, self.arena + tail)
+
+            chosen = self.choose(digest)
+            ENTRY.pack_into(
+                self.mm, self.entry_offset(chosen), digest, tail, length, clock, flags
+            )
+            self.set_header(tail + length, clock + 1)
+
+    def choose(self, digest: bytes) -> int:
+        """the entry of digest, else a free one, else the least recently used"""
+        free = None
+        oldest: Tuple[int, int] = (-1, -1)
+        for index in self.entries(digest):
+            key, _, _, used, flags = ENTRY.unpack_from(
+                self.mm, self.entry_offset(index)
+            )
+            if not flags & VALID:
+                if free is None:
+                    free = index
+            elif key == digest:
+                return index
+            elif oldest[0] == -1 or used < oldest[1]:
+                oldest = (index, used)
+        return free if free is not None else oldest[0]
+
+    def evict(self, start: int, end: int) -> None:
+        """invalidate the entries whose data overlaps [start, end)"""
+        if start == end:
+            return
+        table = self.mm[HEADER.size : self.arena]
+        for index, (key, offset, length, used, flags) in enumerate(
+            ENTRY.iter_unpack(table)
+        ):
+            if flags & VALID and offset < end and start < offset + length:
+                ENTRY.pack_into(
+                    self.mm, self.entry_offset(index), key, offset, length, used, 0
+                )
+
+    async def lock_process(self, offset: int) -> None:
+        """poll the fcntl lock, the other processes hold it for a whole fill"""
+        delay = 0.001
+        while True:
+            try:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EACCES, errno.EAGAIN):  # pragma: no cover
+                    raise
+            await anyio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    @asynccontextmanager
+    async def single_flight(self, digest: bytes) -> AsyncIterator[None]:
+        # the tasks of this process wait on an anyio lock per key,
+        # its holder waits on the fcntl lock of the key for the other processes
+        lock = self.fill_locks.get(digest)
+        if lock is None:
+            lock = self.fill_locks[digest] = anyio.Lock()
+        offset = FILL_LOCKS + int.from_bytes(digest[:6], "little")
+        try:
+            async with lock:
+                await self.lock_process(offset)
+                try:
+                    yield
+                finally:
+                    fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, offset)
+        finally:
+            if not lock.locked() and not lock.statistics().tasks_waiting:
+                self.fill_locks.pop(digest, None)
+
+    async def fill(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        digest = stable_key(key)
+        found, value = self.lookup(digest)
+        if found:
+            return value
+        async with self.single_flight(digest):
+            found, value = self.lookup(digest)
+            if found:
+                return value
+            value = await factory()
+            self.store(digest, value)
+            return value
+
+
+class _TableLock:
+    """threading lock inside the process, fcntl lock on byte 0 across processes"""
+
+    def __init__(self, cache: SharedCache) -> None:
+        self.cache = cache
+
+    def __enter__(self) -> None:
+        self.cache.lock.acquire()
+        try:
+            fcntl.lockf(self.cache.fd, fcntl.LOCK_EX, 1, 0)
+        except BaseException:  # pragma: no cover
+            self.cache.lock.release()
+            raise
+
+    def __exit__(self, *args: Any) -> None:
+        fcntl.lockf(self.cache.fd, fcntl.LOCK_UN, 1, 0)
+        self.cache.lock.release()
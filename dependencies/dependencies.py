@@ -1,12 +1,16 @@
+import collections
 import functools
 import inspect
+import math
 from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from types import NoneType
 from typing import (
     Annotated,
     Any,
     AsyncGenerator,
     AsyncIterator,
+    Awaitable,
     Callable,
     ContextManager,
     Coroutine,
@@ -16,8 +20,10 @@ from typing import (
     Hashable,
     Iterator,
     List,
+    Literal,
     Optional,
     ParamSpec,
+    Protocol,
     Tuple,
     TypeAlias,
     TypeVar,
@@ -25,23 +31,46 @@ from typing import (
     cast,
     get_args,
     get_origin,
-    is_typeddict,
 )
 
 import anyio
 from anyio.to_thread import run_sync
 
+from .models import (
+    ModelList,
+    get_model_adapter,
+    is_any_typeddict,
+    is_model_list,
+    validate_model,
+)
+
 P = ParamSpec("P")
 R = TypeVar("R")
 
 
 DependentCall: TypeAlias = Callable[..., R]
 
+# set by dependencies.profile, see Profiler for the hooks
+tracer_var: ContextVar[Optional[Any]] = ContextVar("tracer", default=None)
+# anyio.current_time() after which no dependency starts
+deadline_var: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+# a cancelled sync call returns without waiting for its thread
+abandon_var: ContextVar[bool] = ContextVar("abandon", default=False)
+
+OnTimeout: TypeAlias = Literal["raise", "default"]
+
+
+class DependencyTimeout(TimeoutError):
+    def __init__(self, dependent: "Dependent") -> None:
+        self.dependent = dependent
+        name = dependent.name or getattr(dependent.call, "__name__", dependent.call)
+        super().__init__(f"{name} timed out")
+
 
 def get_dict_signature(cls: Any) -> Optional[inspect.Signature]:
     typed_params: List[inspect.Parameter] = []
     if inspect.isclass(cls):
-        if is_typeddict(cls):
+        if is_any_typeddict(cls):
             typed_params.extend(
                 inspect.Parameter(
                     name=name,
@@ -100,6 +129,15 @@ def get_typed_signature(call: Callable[..., Any]) -> inspect.Signature:
     return typed_signature
 
 
+class ResultCache(Protocol):
+    """Backend shared by the resolutions, e.g. dependencies.cache.SharedCache"""
+
+    async def fill(
+        self, key: Hashable, factory: Callable[[], Awaitable[Any]]
+    ) -> Any:  # pragma: no cover
+        ...
+
+
 def _make_key(
     dependent: "Dependent", args: Tuple[Any, ...], kwargs: Dict[str, Any]
 ) -> Hashable:
@@ -117,6 +155,12 @@ class Dependent(Generic[R]):
         use_cache: bool = False,
         var_namespace: Optional[Callable[[], Dict[str, Any]]] = None,
         make_key: Callable[..., Hashable] = _make_key,
+        cache: Optional[ResultCache] = None,
+        lazy: bool = False,
+        default: Optional[Any] = None,
+        timeout: Optional[float] = None,
+        on_timeout: OnTimeout = "raise",
+        hedge: Optional["Hedge"] = None,
     ) -> None:
         self.name = name
         self.dependencies = dependencies or []
@@ -125,6 +169,12 @@ class Dependent(Generic[R]):
         self.use_cache = use_cache
         self.make_key = make_key
         self.var_namespace = var_namespace
+        self.cache = cache
+        self.lazy = lazy
+        self.default = default
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.hedge = hedge
 
     @property
     def signature(self):
@@ -140,7 +190,16 @@ class Dependent(Generic[R]):
 
 
 class Depends(Generic[R]):
-    __slots__ = ("dependency", "use_cache", "default")
+    __slots__ = (
+        "dependency",
+        "use_cache",
+        "default",
+        "revalidate",
+        "cache",
+        "timeout",
+        "on_timeout",
+        "hedge",
+    )
 
     def __init__(
         self,
@@ -148,10 +207,25 @@ class Depends(Generic[R]):
         *,
         default: Optional[Any] = None,
         use_cache: bool = False,
+        revalidate: bool = True,
+        cache: Optional[ResultCache] = None,
+        timeout: Optional[float] = None,
+        on_timeout: OnTimeout = "raise",
+        hedge: Optional["Hedge"] = None,
     ):
+        if on_timeout not in ("raise", "default"):
+            raise ValueError(f"on_timeout must be 'raise' or 'default': {on_timeout}")
         self.dependency = dependency
         self.use_cache = use_cache
         self.default = default
+        # List[Model] only: True validates the fields of Model instances again,
+        # False passes them through like pydantic does
+        self.revalidate = revalidate
+        self.cache = cache
+        # seconds, on_timeout="default" returns default instead of DependencyTimeout
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.hedge = hedge
 
     def __str__(self) -> str:  # pragma: no cover
         attr = getattr(self.dependency, "__name__", type(self.dependency).__name__)
@@ -160,10 +234,118 @@ class Depends(Generic[R]):
         return f"{self.__class__.__name__}({attr}, {cache}, {default})"
 
 
+class Lazy(Generic[R]):
+    """Handle of a dependency which is resolved on the first await or call
+
+    async def audit(logger: Annotated[Lazy[Logger], Depends(get_logger)]):
+        if rare:
+            (await logger).info("...")
+
+    The handle is only given to its consumer, it is not added to the namespace
+    read by the other dependencies. It can't be awaited once the exit stack of
+    its resolution is closed.
+    """
+
+    __slots__ = ("factory", "lock", "solved", "result", "closed")
+
+    def __init__(self, factory: Callable[[], Awaitable[R]]) -> None:
+        self.factory = factory
+        self.lock = anyio.Lock()
+        self.solved = False
+        self.result: Optional[R] = None
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+        self.result = None
+
+    async def __call__(self) -> R:
+        if self.closed:
+            raise RuntimeError("the resolution of this Lazy handle has exited")
+        if not self.solved:
+            async with self.lock:
+                if not self.solved:
+                    self.result = await self.factory()
+                    self.solved = True
+        return cast(R, self.result)
+
+    def __await__(self):
+        return self.__call__().__await__()
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.__class__.__name__}(solved={self.solved})"
+
+
+class Hedge:
+    """Start a second attempt of an idempotent dependency after the p95 latency
+
+    fetch = Hedge()
+
+    async def get_price(price: Annotated[float, Depends(get_quote, hedge=fetch)]):
+        ...
+
+    The first result wins, the other attempt is cancelled (a sync call keeps
+    running in its thread). No attempt is hedged until `min_samples` latencies
+    are recorded. Generator dependencies are never hedged.
+    """
+
+    def __init__(
+        self, quantile: float = 0.95, window: int = 100, min_samples: int = 10
+    ) -> None:
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.latencies: collections.deque[float] = collections.deque(maxlen=window)
+
+    @property
+    def delay(self) -> Optional[float]:
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(math.ceil(self.quantile * len(ordered)) - 1, 0)]
+
+    async def run(self, fill: Callable[[], Awaitable[R]]) -> R:
+        delay = self.delay
+        started = anyio.current_time()
+        if delay is None:
+            result = await fill()
+            self.latencies.append(anyio.current_time() - started)
+            return result
+
+        results: List[R] = []
+        errors: List[Exception] = []
+        attempts = 0
+
+        async def attempt(wait: float) -> None:
+            nonlocal attempts
+            await anyio.sleep(wait)
+            attempts += 1
+            try:
+                result = await fill()
+            except Exception as e:
+                errors.append(e)
+                # give up unless the other attempt is still running
+                if attempts == 1 or len(errors) == 2:
+                    tg.cancel_scope.cancel()
+                return
+            results.append(result)
+            tg.cancel_scope.cancel()
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(attempt, 0)
+            tg.start_soon(attempt, delay)
+        if not results:
+            raise errors[0]
+        self.latencies.append(anyio.current_time() - started)
+        return results[0]
+
+
 async def run_in_threadpool(func: DependentCall[R], *args: Any, **kwargs: Any) -> R:
     if kwargs:
         func = functools.partial(func, **kwargs)
-    return await run_sync(func, *args)
+    tracer = tracer_var.get()
+    if tracer is not None:
+        func = tracer.wrap_thread(func)
+    return await run_sync(func, *args, abandon_on_cancel=abandon_var.get())
 
 
 _CM_T = TypeVar("_CM_T")
@@ -181,7 +363,13 @@ async def contextmanager_in_threadpool(
     # works (1 is arbitrary)
     exit_limiter = anyio.CapacityLimiter(1)
     try:
-        yield await run_in_threadpool(cm.__enter__)
+        # never abandon __enter__, its __exit__ must run
+        token = abandon_var.set(False)
+        try:
+            value = await run_in_threadpool(cm.__enter__)
+        finally:
+            abandon_var.reset(token)
+        yield value
     except Exception as e:  # pragma: no cover
         ok = bool(await run_sync(cm.__exit__, type(e), e, None, limiter=exit_limiter))
         if not ok:
@@ -211,15 +399,26 @@ def get_typed_annotation(annotation: Any, globalns: Dict[str, Any]) -> Any:
     return annotation
 
 
-def get_sub_dependent(name, annotation, depends: Depends[R]) -> Dependent[R]:
+def get_sub_dependent(
+    name, annotation, depends: Depends[R], lazy: bool = False
+) -> Dependent[R]:
     dependency: Callable[..., R] = (
         depends.dependency if depends.dependency else annotation
     )
+    if is_model_list(dependency):
+        # Annotated[List[User], Depends()]
+        dependency = ModelList(dependency, name=name, revalidate=depends.revalidate)
 
     return get_dependent(
         call=dependency,
         name=name,
         use_cache=depends.use_cache,
+        cache=depends.cache,
+        lazy=lazy,
+        default=depends.default,
+        timeout=depends.timeout,
+        on_timeout=depends.on_timeout,
+        hedge=depends.hedge,
     )
 
 
@@ -228,26 +427,47 @@ def get_dependent(
     *,
     name: Optional[str] = None,
     use_cache: bool = True,
+    cache: Optional[ResultCache] = None,
+    lazy: bool = False,
+    default: Optional[Any] = None,
+    timeout: Optional[float] = None,
+    on_timeout: OnTimeout = "raise",
+    hedge: Optional[Hedge] = None,
 ) -> Dependent[R]:
     if isinstance(call, Dependent):
         return call
-    dependent = Dependent(call=call, name=name, use_cache=use_cache)
+    dependent = Dependent(
+        call=call,
+        name=name,
+        use_cache=use_cache,
+        cache=cache,
+        lazy=lazy,
+        default=default,
+        timeout=timeout,
+        on_timeout=on_timeout,
+        hedge=hedge,
+    )
     signature_params = dependent.signature.parameters
     for _, param in signature_params.items():
         depends: Optional[Depends] = None
         annotation = param.annotation
+        items: List[Any] = []
         if get_origin(param.annotation) is Annotated:
             annotation, *items = get_args(param.annotation)
             annotation = get_typed_annotation(
                 annotation, globalns=getattr(call, "__globals__", {})
             )
-            for depends in items:
-                if isinstance(depends, Depends):
-                    # Annotated[User, Depends(get_user)]
-                    # Annotated[User, Depends()]
-                    if depends.dependency is None:
-                        depends.dependency = annotation
-                    continue
+        is_lazy = get_origin(annotation) is Lazy
+        if is_lazy:
+            # Annotated[Lazy[User], Depends()]
+            annotation = get_args(annotation)[0]
+        for depends in items:
+            if isinstance(depends, Depends):
+                # Annotated[User, Depends(get_user)]
+                # Annotated[User, Depends()]
+                if depends.dependency is None:
+                    depends.dependency = annotation
+                continue
         if depends and isinstance(param.default, Depends):  # pragma: no cover
             raise ValueError(
                 f"{param.name} have two depends:{ depends}, {param.default}"
@@ -261,6 +481,7 @@ def get_dependent(
                     annotation, globalns=getattr(call, "__globals__", {})
                 ),
                 depends=depends,
+                lazy=is_lazy,
             )
             dependent.dependencies.append(sub_dependent)
 
@@ -368,7 +589,10 @@ async def apply(
     kwargs: Dict[str, Any],
     stack: AsyncExitStack,
 ) -> Any:
-    if is_gen_callable(call) or is_async_gen_callable(call):
+    adapter = get_model_adapter(call)
+    if adapter is not None and not args:
+        return await validate_model(adapter, kwargs)
+    elif is_gen_callable(call) or is_async_gen_callable(call):
         return await solve_generator(call=call, stack=stack, args=args, kwargs=kwargs)
     elif is_coroutine_callable(call):
         call = cast(Callable[..., Coroutine], call)
@@ -377,6 +601,99 @@ async def apply(
         return await run_in_threadpool(call, *args, **kwargs)
 
 
+async def apply_dependent(
+    dependent: Dependent,
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+    stack: AsyncExitStack,
+    cache_key: Hashable,
+) -> Any:
+    """apply through the tracer, hedge, result cache and deadline of dependent"""
+    tracer = tracer_var.get()
+    call = dependent.call
+    fill: Callable[[], Awaitable[Any]]
+    fill = functools.partial(apply, call, args, kwargs, stack)
+    hedge = dependent.hedge
+    if hedge is not None and (is_gen_callable(call) or is_async_gen_callable(call)):
+        # two attempts would both enter the exit stack
+        hedge = None
+    if hedge is not None:
+        fill = functools.partial(hedge.run, fill)
+    if tracer is not None:
+        # around the hedge: one call, whatever its attempts
+        fill = functools.partial(tracer.apply, dependent, fill)
+    if dependent.cache is not None:
+        fill = functools.partial(dependent.cache.fill, cache_key, fill)
+
+    deadline = deadline_var.get()
+    if dependent.timeout is not None:
+        timeout = anyio.current_time() + dependent.timeout
+        deadline = timeout if deadline is None else min(deadline, timeout)
+    if deadline is None and hedge is None:
+        return await fill()
+    if deadline is not None and anyio.current_time() >= deadline:
+        # the budget is spent, don't start it
+        return timed_out(dependent)
+
+    deadline_token = deadline_var.set(deadline)
+    abandon_token = abandon_var.set(True)
+    try:
+        with anyio.CancelScope(deadline=math.inf if deadline is None else deadline):
+            return await fill()
+    finally:
+        abandon_var.reset(abandon_token)
+        deadline_var.reset(deadline_token)
+    return timed_out(dependent)
+
+
+def timed_out(dependent: Dependent) -> Any:
+    if dependent.on_timeout == "default":
+        return dependent.default
+    raise DependencyTimeout(dependent)
+
+
+async def solve_sub_dependent(
+    *,
+    dependent: Dependent,
+    stack: AsyncExitStack,
+    namespace: Dict[str, Any],
+    dependency_cache: Dict[Hashable, Any],
+) -> Any:
+    sub_values: Dict[str, Any] = {}
+    sub_values = await solve_dependencies(
+        dependent=dependent,
+        namespace=namespace,
+        dependency_cache=dependency_cache,
+        stack=stack,
+    )
+
+    args, kwargs = apply_parameter(dependent, sub_values, namespace)
+
+    cache_key = dependent.make_key(dependent, args, kwargs)
+    context = None
+    hit = False
+    if dependent.use_cache:
+        context = context_var.get()
+        if cache_key in dependency_cache:
+            solved, hit = dependency_cache[cache_key], True
+        elif context is not None:
+            # a nested resolution reuses the values its callers got with the same inputs
+            owner = context.find(cache_key, args, kwargs)
+            if owner is not None:
+                solved, hit = owner.dependency_cache[cache_key], True
+    if hit:
+        tracer = tracer_var.get()
+        if tracer is not None:
+            tracer.hit(dependent)
+    else:
+        solved = await apply_dependent(dependent, args, kwargs, stack, cache_key)
+        if dependent.use_cache:
+            dependency_cache[cache_key] = solved
+            if context is not None and context.dependency_cache is dependency_cache:
+                context.inputs[cache_key] = (args, kwargs)
+    return solved
+
+
 async def solve_dependencies(
     *,
     dependent: Dependent,
@@ -392,47 +709,175 @@ async def solve_dependencies(
         namespace.update(dependent.var_namespace())
     sub_dependent: Dependent
     for sub_dependent in dependent.dependencies:
-        sub_values: Dict[str, Any] = {}
-        sub_values = await solve_dependencies(
+        solve = functools.partial(
+            solve_sub_dependent,
             dependent=sub_dependent,
             namespace=namespace,
             dependency_cache=dependency_cache,
             stack=stack,
         )
-
-        args, kwargs = apply_parameter(sub_dependent, sub_values, namespace)
-
-        cache_key = sub_dependent.make_key(sub_dependent, args, kwargs)
-        if sub_dependent.use_cache and cache_key in dependency_cache:
-            solved = dependency_cache[cache_key]
+        if sub_dependent.lazy:
+            # resolved with the same namespace, cache and stack when awaited
+            solved: Any = Lazy(solve)
+            stack.callback(solved.close)
         else:
-            solved = await apply(sub_dependent.call, args, kwargs, stack)
-            if sub_dependent.use_cache:
-                dependency_cache[cache_key] = solved
+            solved = await solve()
 
         if sub_dependent.name is not None:
             values[sub_dependent.name] = solved
-            namespace[sub_dependent.name] = solved
+            if not sub_dependent.lazy:
+                namespace[sub_dependent.name] = solved
 
     return values
 
 
+def same(a: Any, b: Any) -> bool:
+    if a is b:
+        return True
+    try:
+        return bool(a == b)
+    except Exception:
+        # e.g. arrays which compare element-wise
+        return False
+
+
+# args and kwargs of a call
+Inputs = Tuple[Tuple[Any, ...], Dict[str, Any]]
+
+
+def same_inputs(inputs: Inputs, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> bool:
+    return (
+        len(args) == len(inputs[0])
+        and kwargs.keys() == inputs[1].keys()
+        and all(same(a, b) for a, b in zip(args, inputs[0]))
+        and all(same(value, inputs[1][key]) for key, value in kwargs.items())
+    )
+
+
+class ResolutionContext:
+    """Exit stack and cache of the running resolution
+
+    The nested resolutions share its exit stack, they have their own cache and
+    reuse its values only when resolved with the same inputs, since the cache
+    key ignores them. Once closed, e.g. for a task started by the resolution
+    which outlives it, the nested resolutions use their own stack.
+    """
+
+    __slots__ = ("stack", "dependency_cache", "inputs", "parent", "closed")
+
+    def __init__(
+        self,
+        stack: AsyncExitStack,
+        dependency_cache: Dict[Hashable, Any],
+        parent: Optional["ResolutionContext"] = None,
+        inputs: Optional[Dict[Hashable, Inputs]] = None,
+    ) -> None:
+        self.stack = stack
+        self.dependency_cache = dependency_cache
+        # args and kwargs of the cached values
+        self.inputs = {} if inputs is None else inputs
+        self.parent = parent
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+    def find(
+        self, key: Hashable, args: Tuple[Any, ...], kwargs: Dict[str, Any]
+    ) -> Optional["ResolutionContext"]:
+        """the innermost resolution which cached key with the same inputs"""
+        context: Optional[ResolutionContext] = self
+        while context is not None:
+            inputs = context.inputs.get(key)
+            if (
+                not context.closed
+                and inputs is not None
+                and same_inputs(inputs, args, kwargs)
+            ):
+                return context
+            context = context.parent
+        return None
+
+
+context_var: ContextVar[Optional[ResolutionContext]] = ContextVar(
+    "context", default=None
+)
+
+
+def get_deadline(timeout: Optional[float]) -> Optional[float]:
+    """the budget of the whole resolution, shrunk by the caller's one"""
+    deadline = deadline_var.get()
+    if timeout is not None:
+        budget = anyio.current_time() + timeout
+        deadline = budget if deadline is None else min(deadline, budget)
+    return deadline
+
+
+async def solve_in_context(
+    *,
+    dependent: Dependent,
+    stack: AsyncExitStack,
+    namespace: Dict[str, Any],
+    dependency_cache: Dict[Hashable, Any],
+    deadline: Optional[float] = None,
+    parent: Optional[ResolutionContext] = None,
+) -> Dict[str, Any]:
+    context = ResolutionContext(stack, dependency_cache, parent)
+    token = context_var.set(context)
+    deadline_token = deadline_var.set(deadline)
+    try:
+        return await solve_dependencies(
+            dependent=dependent,
+            stack=stack,
+            namespace=namespace,
+            dependency_cache=dependency_cache,
+        )
+    finally:
+        # still referenced by the contexts copied during the resolution
+        context.close()
+        deadline_var.reset(deadline_token)
+        context_var.reset(token)
+
+
 async def run_dependent(
     dependent: Dependent[R],
     stack: Optional[AsyncExitStack] = None,
+    *,
+    _share_context: bool = True,
+    _timeout: Optional[float] = None,
     **namespace: Any,
 ) -> R:
     assert dependent.name is None
     dependent.name = "result"
+    # the result depends on the namespace, never reuse it from a shared cache
+    dependent.use_cache = False
     wrap: Dependent = Dependent(dict, dependencies=[dependent])
+    # a nested resolution, e.g. a decorator wrapped function called by a dependency
+    context = context_var.get() if _share_context else None
+    if context is not None and context.closed:
+        context = None
+    dependency_cache: Dict[Hashable, Any] = {}
+    if context is not None:
+        stack = context.stack if stack is None else stack
+    deadline = get_deadline(_timeout)
     if stack is None:
         async with AsyncExitStack() as stack:
-            solved = await solve_dependencies(
-                dependent=wrap, stack=stack, namespace=namespace
+            solved = await solve_in_context(
+                dependent=wrap,
+                stack=stack,
+                namespace=namespace,
+                dependency_cache=dependency_cache,
+                deadline=deadline,
+                parent=context,
             )
     else:
-        solved = await solve_dependencies(
-            dependent=wrap, stack=stack, namespace=namespace
+        solved = await solve_in_context(
+            dependent=wrap,
+            stack=stack,
+            namespace=namespace,
+            dependency_cache=dependency_cache,
+            deadline=deadline,
+            parent=context,
         )
 
     return cast(R, solved.get("result"))  # pyright: ignore[reportUnboundVariable]
@@ -443,15 +888,48 @@ async def solve_dependent(
     dependencies: Optional[List[Dependent]] = None,
     stack: Optional[AsyncExitStack] = None,
     var_namespace: Optional[Callable[..., Dict[str, Any]]] = None,
+    *,
+    _share_context: bool = True,
+    _timeout: Optional[float] = None,
     **namespace: Any,
 ) -> R:
+    """resolve call with the values of namespace
+
+    `_share_context=False` resolves it on its own when nested in a running
+    resolution, `_timeout` is the budget of the whole resolution in seconds.
+    They are prefixed so that they don't take over a value of the namespace.
+    """
     dependent = get_dependent(call=call)
     if var_namespace is not None:
         dependent.var_namespace = var_namespace
     dependencies = dependencies if dependencies is not None else []
     dependent.dependencies = dependencies + (dependent.dependencies or [])
 
-    return await run_dependent(dependent=dependent, stack=stack, **namespace)
+    return await run_dependent(
+        dependent=dependent,
+        stack=stack,
+        _share_context=_share_context,
+        _timeout=_timeout,
+        **namespace,
+    )
+
+
+class DecoratorOptions:
+    """options of a function wrapped by decorator"""
+
+    __slots__ = ("dependencies", "stack", "share_context", "timeout")
+
+    def __init__(
+        self,
+        dependencies: Optional[List[Dependent]],
+        stack: Optional[AsyncExitStack],
+        share_context: bool,
+        timeout: Optional[float],
+    ) -> None:
+        self.dependencies = dependencies
+        self.stack = stack
+        self.share_context = share_context
+        self.timeout = timeout
 
 
 def decorator(
@@ -459,12 +937,30 @@ def decorator(
     *,
     dependencies: Optional[List[Dependent]] = None,
     stack: Optional[AsyncExitStack] = None,
+    share_context: bool = True,
+    timeout: Optional[float] = None,
 ) -> Callable[..., Coroutine[None, None, R]]:
     async def wrapper(**kwargs: Any) -> R:
         return await solve_dependent(
-            func, dependencies=dependencies, stack=stack, var_namespace=None, **kwargs
+            func,
+            dependencies=dependencies,
+            stack=stack,
+            var_namespace=None,
+            _share_context=share_context,
+            _timeout=timeout,
+            **kwargs,
         )
 
+    functools.update_wrapper(wrapper, func)
+    # resolved with the keywords of the call, not the parameters of func
+    wrapper.__signature__ = inspect.signature(wrapper, follow_wrapped=False)  # type: ignore
+    # used with __wrapped__ by dependencies.profile to rebuild the resolution
+    wrapper.options = DecoratorOptions(  # type: ignore
+        dependencies=dependencies,
+        stack=stack,
+        share_context=share_context,
+        timeout=timeout,
+    )
     return wrapper
 
 
@@ -473,7 +969,21 @@ def builder(
     *,
     dependencies: Optional[List[Dependent]] = None,
     stack: Optional[AsyncExitStack] = None,
+    share_context: bool = True,
+    timeout: Optional[float] = None,
 ):
     if func is None:
-        return functools.partial(decorator, dependencies=dependencies, stack=stack)
-    return decorator(func, dependencies=dependencies, stack=stack)
+        return functools.partial(
+            decorator,
+            dependencies=dependencies,
+            stack=stack,
+            share_context=share_context,
+            timeout=timeout,
+        )
+    return decorator(
+        func,
+        dependencies=dependencies,
+        stack=stack,
+        share_context=share_context,
+        timeout=timeout,
+    )
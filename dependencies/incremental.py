@@ -0,0 +1,207 @@
+import functools
+from contextlib import AsyncExitStack
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
+
+import anyio
+
+from .dependencies import (
+    Dependent,
+    DependentCall,
+    Inputs,
+    Lazy,
+    ResolutionContext,
+    apply_dependent,
+    apply_parameter,
+    context_var,
+    deadline_var,
+    get_deadline,
+    get_dependent,
+    same_inputs,
+)
+
+R = TypeVar("R")
+
+
+def expired(dependent: Dependent, started: float) -> bool:
+    """the deadline of dependent passed, its result may be its default"""
+    deadline = deadline_var.get()
+    if dependent.timeout is not None:
+        timeout = started + dependent.timeout
+        deadline = timeout if deadline is None else min(deadline, timeout)
+    return deadline is not None and anyio.current_time() >= deadline
+
+
+class Node:
+    """inputs read by a dependent and its result in the last resolution"""
+
+    __slots__ = ("args", "kwargs", "result", "stack", "solved")
+
+    def __init__(self) -> None:
+        self.args: Tuple[Any, ...] = ()
+        self.kwargs: Dict[str, Any] = {}
+        self.result: Any = None
+        self.stack = AsyncExitStack()
+        self.solved = False
+
+    def unchanged(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> bool:
+        return self.solved and same_inputs((self.args, self.kwargs), args, kwargs)
+
+
+class IncrementalSession(Generic[R]):
+    """Resolve a dependent repeatedly, recomputing only the changed nodes
+
+    Each node records the namespace values and upstream results it read, the
+    next `solve` reuses its result when they are the same (`is` or `==`).
+    Generator nodes keep their own exit stack, they are torn down and
+    recreated only when invalidated, the rest by `close`.
+
+    async with IncrementalSession(process) as session:
+        for event in events:
+            await session.solve(event=event, config=config)
+
+    Lazy handles are recreated by every `solve` and closed when it returns,
+    their consumers are always recomputed. Nested resolutions, e.g. decorator
+    wrapped functions called by a node, share the exit stack of the node.
+    `solve(_timeout=...)` bounds the whole resolution like `solve_dependent`,
+    the nodes which reached their deadline are recomputed by the next `solve`.
+    """
+
+    def __init__(
+        self,
+        call: Union[DependentCall[R], Dependent[R]],
+        dependencies: Optional[List[Dependent]] = None,
+        var_namespace: Optional[Callable[..., Dict[str, Any]]] = None,
+    ) -> None:
+        dependent = get_dependent(call=call)
+        if var_namespace is not None:
+            dependent.var_namespace = var_namespace
+        dependencies = dependencies if dependencies is not None else []
+        dependent.dependencies = dependencies + (dependent.dependencies or [])
+        assert dependent.name is None
+        dependent.name = "result"
+        dependent.use_cache = False
+        self.root: Dependent = Dependent(dict, dependencies=[dependent])
+        self.nodes: Dict[Dependent, Node] = {}
+        # dependents recomputed by the last solve
+        self.recomputed: List[Dependent] = []
+        # Lazy handles, caller's context and cached inputs of the running solve
+        self.handles: List[Lazy] = []
+        self.parent: Optional[ResolutionContext] = None
+        self.inputs: Dict[Hashable, Inputs] = {}
+
+    async def __aenter__(self) -> "IncrementalSession[R]":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        nodes, self.nodes = self.nodes, {}
+        for node in reversed(list(nodes.values())):
+            await node.stack.aclose()
+
+    async def solve(self, *, _timeout: Optional[float] = None, **namespace: Any) -> R:
+        self.recomputed = []
+        self.parent = context_var.get()
+        self.inputs = {}
+        deadline_token = deadline_var.set(get_deadline(_timeout))
+        try:
+            solved = await self.solve_dependencies(
+                dependent=self.root, namespace=namespace, dependency_cache={}
+            )
+        finally:
+            deadline_var.reset(deadline_token)
+            self.parent = None
+            handles, self.handles = self.handles, []
+            for handle in handles:
+                handle.close()
+        return cast(R, solved.get("result"))
+
+    async def solve_dependencies(
+        self,
+        *,
+        dependent: Dependent,
+        namespace: Dict[str, Any],
+        dependency_cache: Dict[Hashable, Any],
+    ) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        if dependent.var_namespace is not None:
+            namespace.update(dependent.var_namespace())
+        for sub_dependent in dependent.dependencies:
+            solve = functools.partial(
+                self.solve_node,
+                dependent=sub_dependent,
+                namespace=namespace,
+                dependency_cache=dependency_cache,
+            )
+            if sub_dependent.lazy:
+                solved: Any = Lazy(solve)
+                self.handles.append(solved)
+            else:
+                solved = await solve()
+            if sub_dependent.name is not None:
+                values[sub_dependent.name] = solved
+                if not sub_dependent.lazy:
+                    namespace[sub_dependent.name] = solved
+        return values
+
+    async def solve_node(
+        self,
+        *,
+        dependent: Dependent,
+        namespace: Dict[str, Any],
+        dependency_cache: Dict[Hashable, Any],
+    ) -> Any:
+        sub_values = await self.solve_dependencies(
+            dependent=dependent, namespace=namespace, dependency_cache=dependency_cache
+        )
+        args, kwargs = apply_parameter(dependent, sub_values, namespace)
+
+        cache_key = dependent.make_key(dependent, args, kwargs)
+        if dependent.use_cache and cache_key in dependency_cache:
+            return dependency_cache[cache_key]
+
+        node = self.nodes.get(dependent)
+        if node is None:
+            node = self.nodes[dependent] = Node()
+        if node.unchanged(args, kwargs):
+            solved = node.result
+        else:
+            # invalidated: tear down the previous generator before recreating it
+            node.solved = False
+            await node.stack.aclose()
+            node.stack = AsyncExitStack()
+            context = ResolutionContext(
+                node.stack, dependency_cache, self.parent, self.inputs
+            )
+            # torn down with the node, e.g. for a task started by its call
+            node.stack.callback(context.close)
+            token = context_var.set(context)
+            started = anyio.current_time()
+            try:
+                solved = await apply_dependent(
+                    dependent, args, kwargs, node.stack, cache_key
+                )
+            finally:
+                context_var.reset(token)
+            node.args, node.kwargs, node.result = args, kwargs, solved
+            # a timed out result is not reused
+            node.solved = not expired(dependent, started)
+            self.recomputed.append(dependent)
+
+        if dependent.use_cache:
+            dependency_cache[cache_key] = solved
+            self.inputs[cache_key] = (args, kwargs)
+        return solved
@@ -0,0 +1,152 @@
+import functools
+import inspect
+import sys
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    get_args,
+    get_origin,
+    get_type_hints,
+    is_typeddict,
+)
+
+from anyio.to_thread import run_sync
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pydantic import TypeAdapter
+
+# inputs with at most this many items are validated in the event loop,
+# larger ones are sent to the thread pool
+INLINE_VALIDATION_LIMIT = 64
+
+
+def is_any_typeddict(tp: Any) -> bool:
+    """typing.TypedDict, or typing_extensions.TypedDict once it is imported"""
+    if is_typeddict(tp):
+        return True
+    typing_extensions = sys.modules.get("typing_extensions")
+    return typing_extensions is not None and typing_extensions.is_typeddict(tp)
+
+
+def is_model_type(tp: Any) -> bool:
+    """pydantic.BaseModel (without a custom __init__) or TypedDict"""
+    if not inspect.isclass(tp):
+        return False
+    if is_any_typeddict(tp):
+        return True
+    # pydantic is imported by the first model, not by this check
+    pydantic = sys.modules.get("pydantic")
+    if pydantic is None:
+        return False
+    BaseModel = pydantic.BaseModel
+    return issubclass(tp, BaseModel) and tp.__init__ is BaseModel.__init__
+
+
+def is_model_list(tp: Any) -> bool:
+    """List[Model] / list[Model]"""
+    if get_origin(tp) is not list:
+        return False
+    args = get_args(tp)
+    return len(args) == 1 and is_model_type(args[0])
+
+
+def portable(tp: Any) -> Any:
+    """typing_extensions copy of a typing.TypedDict, pydantic rejects those < 3.12"""
+    if get_origin(tp) is list:
+        return List[portable(get_args(tp)[0])]  # type: ignore
+    if not is_typeddict(tp):
+        return tp
+
+    from typing_extensions import NotRequired, Required, TypedDict
+
+    fields = {
+        name: (
+            Required[annotation]
+            if name in tp.__required_keys__
+            else NotRequired[annotation]
+        )
+        for name, annotation in get_type_hints(tp, include_extras=True).items()
+    }
+    return TypedDict(tp.__name__, fields)  # type: ignore
+
+
+@functools.lru_cache(maxsize=1024)
+def get_type_adapter(tp: Any) -> Optional["TypeAdapter"]:
+    try:
+        from pydantic import PydanticUserError, TypeAdapter
+    except ImportError:  # pragma: no cover
+        return None
+    try:
+        try:
+            return TypeAdapter(tp)
+        except PydanticUserError:
+            # typing.TypedDict on python < 3.12
+            return TypeAdapter(portable(tp))
+    except (PydanticUserError, NameError):
+        # e.g. unresolved forward references
+        return None
+
+
+def get_model_adapter(call: Any) -> Optional["TypeAdapter"]:
+    if not is_model_type(call):
+        return None
+    return get_type_adapter(call)
+
+
+def input_size(values: Iterable[Any]) -> int:
+    return sum(
+        len(value) if isinstance(value, (list, tuple, dict, set)) else 1
+        for value in values
+    )
+
+
+async def validate_python(adapter: "TypeAdapter", value: Any, size: int) -> Any:
+    if size <= INLINE_VALIDATION_LIMIT:
+        return adapter.validate_python(value)
+    return await run_sync(adapter.validate_python, value)
+
+
+async def validate_model(adapter: "TypeAdapter", kwargs: Dict[str, Any]) -> Any:
+    return await validate_python(adapter, kwargs, input_size(kwargs.values()))
+
+
+class ModelList:
+    """Validate `List[Model]` input in one `validate_python` call
+
+    users: Annotated[List[User], Depends()]
+
+    pydantic passes the instances of the model through (its default
+    `revalidate_instances="never"`), `revalidate=True` validates their fields
+    again.
+    """
+
+    def __init__(self, annotation: Any, name: str, revalidate: bool = True) -> None:
+        self.annotation = annotation
+        self.model = get_args(annotation)[0]
+        self.name = name
+        self.revalidate = revalidate
+        self.__signature__ = inspect.Signature(
+            [inspect.Parameter(name=name, kind=inspect.Parameter.KEYWORD_ONLY)]
+        )
+
+    async def __call__(self, **kwargs: Any) -> List[Any]:
+        values = kwargs[self.name]
+        adapter = get_type_adapter(self.annotation)
+        if adapter is None:
+            raise TypeError(f"{self.annotation} is not supported by pydantic")
+        if self.revalidate and not is_any_typeddict(self.model):
+            values = [
+                dict(value) if isinstance(value, self.model) else value
+                for value in values
+            ]
+        return await validate_python(adapter, values, len(values))
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.__class__.__name__}({self.annotation}, name={self.name})"
+
+    # part of the shared cache keys, without an address
+    __repr__ = __str__
@@ -0,0 +1,305 @@
+"""Profile the resolution of a dependency graph
+
+python -m dependencies.profile module:function --iterations 100 --kw key=value
+"""
+
+import argparse
+import ast
+import importlib
+import math
+import sys
+import time
+from contextvars import ContextVar
+from typing import IO, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import anyio
+
+from .dependencies import (
+    DecoratorOptions,
+    Dependent,
+    get_dependent,
+    run_dependent,
+    tracer_var,
+)
+
+Path = Tuple[str, ...]
+
+
+def label(dependent: Dependent) -> str:
+    call = dependent.call
+    name = getattr(call, "__name__", type(call).__name__)
+    if dependent.name is None or dependent.name == name:
+        return name
+    return f"{dependent.name}={name}"
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+class NodeStats:
+    def __init__(self, path: Path, nested: bool = False) -> None:
+        self.path = path
+        # resolved inside the call of another node, e.g. a nested decorator call
+        self.nested = nested
+        self.times: List[float] = []
+        self.waits: List[float] = []
+        self.runs: List[float] = []
+        self.hits = 0
+
+    @property
+    def calls(self) -> int:
+        return len(self.times) + self.hits
+
+    @property
+    def mean(self) -> float:
+        return sum(self.times) / len(self.times) if self.times else 0.0
+
+    @property
+    def p99(self) -> float:
+        return percentile(self.times, 0.99)
+
+    @property
+    def wait(self) -> float:
+        """mean time waiting for a thread slot per call"""
+        return sum(self.waits) / len(self.times) if self.times else 0.0
+
+    @property
+    def run(self) -> float:
+        """mean time running in the thread pool per call"""
+        return sum(self.runs) / len(self.times) if self.times else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.calls if self.calls else 0.0
+
+
+class Profiler:
+    """Collect timings through the `tracer_var` hooks of solve_dependencies"""
+
+    def __init__(self) -> None:
+        self.iterations = 0
+        self.root: Optional[Path] = None
+        self.nodes: Dict[Path, NodeStats] = {}
+        self.graph: Dict[Path, List[Path]] = {}
+        self.paths: Dict[Dependent, Path] = {}
+        self.current: ContextVar[Optional[NodeStats]] = ContextVar(
+            "current", default=None
+        )
+
+    def track(self, root: Dependent) -> None:
+        """register the graph of the next resolution"""
+
+        def walk(dependent: Dependent, parent: Path) -> Path:
+            path = parent + (label(dependent),)
+            self.paths[dependent] = path
+            self.graph[path] = [walk(sub, path) for sub in dependent.dependencies]
+            return path
+
+        self.iterations += 1
+        self.paths = {}
+        self.root = walk(root, ())
+
+    def node(self, dependent: Dependent) -> NodeStats:
+        path = self.paths.get(dependent)
+        nested = path is None
+        if path is None:
+            current = self.current.get()
+            path = (current.path if current else ()) + (label(dependent),)
+        stats = self.nodes.get(path)
+        if stats is None:
+            stats = self.nodes[path] = NodeStats(path, nested=nested)
+        return stats
+
+    def hit(self, dependent: Dependent) -> None:
+        self.node(dependent).hits += 1
+
+    async def apply(
+        self, dependent: Dependent, fill: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        stats = self.node(dependent)
+        token = self.current.set(stats)
+        started = time.perf_counter()
+        try:
+            return await fill()
+        finally:
+            stats.times.append(time.perf_counter() - started)
+            self.current.reset(token)
+
+    def wrap_thread(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        stats = self.current.get()
+        if stats is None:  # pragma: no cover
+            return func
+        submitted = time.perf_counter()
+
+        def run(*args: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                stats.waits.append(started - submitted)
+                stats.runs.append(time.perf_counter() - started)
+
+        return run
+
+    def cost(self, path: Path) -> float:
+        """time spent in the node per resolution"""
+        stats = self.nodes.get(path)
+        if stats is None or not self.iterations:
+            return 0.0
+        return sum(stats.times) / self.iterations
+
+    def critical_path(self) -> Tuple[List[Path], float]:
+        """the slowest chain of the graph if siblings ran in parallel"""
+
+        def walk(path: Path) -> Tuple[float, List[Path]]:
+            slowest: Tuple[float, List[Path]] = (0.0, [])
+            for child in self.graph.get(path, []):
+                slowest = max(slowest, walk(child), key=lambda item: item[0])
+            return self.cost(path) + slowest[0], [path] + slowest[1]
+
+        if self.root is None:
+            return [], 0.0
+        elapsed, path = walk(self.root)
+        return path, elapsed
+
+    def sequential(self) -> float:
+        return sum(self.cost(path) for path in self.graph)
+
+    def speedup(self) -> float:
+        _, critical = self.critical_path()
+        return self.sequential() / critical if critical else 1.0
+
+    def ordered(self) -> List[NodeStats]:
+        children: Dict[Path, List[Path]] = {
+            path: list(children) for path, children in self.graph.items()
+        }
+        for path, stats in self.nodes.items():
+            if stats.nested:
+                children.setdefault(path[:-1], []).append(path)
+        results: List[NodeStats] = []
+
+        def walk(path: Path) -> None:
+            if path in self.nodes:
+                results.append(self.nodes[path])
+            for child in children.get(path, []):
+                walk(child)
+
+        if self.root is not None:
+            walk(self.root)
+        return results
+
+    def report(self, file: Optional[IO[str]] = None) -> None:
+        file = sys.stdout if file is None else file
+        print(
+            f"{'node':<40} {'calls':>7} {'mean ms':>9} {'p99 ms':>9}"
+            f" {'wait ms':>9} {'run ms':>9} {'hit rate':>9}",
+            file=file,
+        )
+        for stats in self.ordered():
+            name = "  " * (len(stats.path) - 1) + stats.path[-1]
+            print(
+                f"{name:<40} {stats.calls:>7} {stats.mean * 1e3:>9.3f}"
+                f" {stats.p99 * 1e3:>9.3f} {stats.wait * 1e3:>9.3f}"
+                f" {stats.run * 1e3:>9.3f} {stats.hit_rate:>9.1%}",
+                file=file,
+            )
+        path, critical = self.critical_path()
+        print(file=file)
+        print(
+            "critical path: " + " -> ".join(node[-1] for node in path),
+            f"({critical * 1e3:.3f} ms)",
+            file=file,
+        )
+        print(
+            f"sequential: {self.sequential() * 1e3:.3f} ms,"
+            f" estimated parallel speedup: {self.speedup():.2f}x",
+            file=file,
+        )
+
+
+async def profile(
+    call: Callable[..., Any],
+    iterations: int = 100,
+    namespace: Optional[Dict[str, Any]] = None,
+) -> Profiler:
+    """resolve the graph of call (plain or wrapped by decorator) repeatedly"""
+    options: Optional[DecoratorOptions] = getattr(call, "options", None)
+    if isinstance(options, DecoratorOptions):
+        # wrapped by decorator, resolved with its options
+        call = getattr(call, "__wrapped__")
+    else:
+        options = None
+    dependencies = (options.dependencies if options else None) or []
+    namespace = namespace or {}
+    profiler = Profiler()
+    token = tracer_var.set(profiler)
+    try:
+        for _ in range(iterations):
+            dependent = get_dependent(call=call)
+            dependent.dependencies = dependencies + dependent.dependencies
+            profiler.track(dependent)
+            if options is None:
+                await run_dependent(dependent, **namespace)
+            else:
+                await run_dependent(
+                    dependent,
+                    stack=options.stack,
+                    _share_context=options.share_context,
+                    _timeout=options.timeout,
+                    **namespace,
+                )
+    finally:
+        tracer_var.reset(token)
+    return profiler
+
+
+def parse_value(value: str) -> Any:
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def import_target(target: str) -> Any:
+    module_name, _, qualname = target.partition(":")
+    obj = importlib.import_module(module_name)
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m dependencies.profile",
+        description="Profile the resolution of a dependency graph",
+    )
+    parser.add_argument("target", help="module:function")
+    parser.add_argument("--iterations", "-n", type=int, default=100)
+    parser.add_argument(
+        "--kw",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="namespace value, parsed as a python literal when possible",
+    )
+    args = parser.parse_args(argv)
+    if ":" not in args.target:
+        parser.error(f"target must be module:function, got {args.target}")
+    namespace: Dict[str, Any] = {}
+    for item in args.kw:
+        key, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"--kw expects key=value, got {item}")
+        namespace[key] = parse_value(value)
+
+    call = import_target(args.target)
+    profiler = anyio.run(profile, call, args.iterations, namespace)
+    profiler.report()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,284 @@
+"""Overhead budgets of a resolution
+
+Memory is measured as the cost of one more node, so fixed costs (event loop,
+wrapper dependent) don't count. The peak budgets bound the traced peak of a
+node, including what it allocates and frees, and of each node between a small
+and a large graph; the retained ones bound what stays referenced. Raise a
+budget only together with the change which needs it.
+"""
+
+import gc
+import inspect
+import statistics
+import tracemalloc
+from typing import Annotated, Any, Awaitable, Callable, Dict, Iterator, List, Tuple
+
+import pytest
+
+import dependencies.dependencies as core
+from dependencies import Dependent, Depends, get_dependent, solve_dependent
+from dependencies.dependencies import apply_parameter
+
+SMALL, LARGE = 10, 50
+
+# peaks are the median of a few runs
+REPEATS = 5
+
+# get_dependent: Dependent, signature and sub dependent of each node
+DEPENDENT_PEAK_BYTES = 3072
+DEPENDENT_BLOCKS = 14
+DEPENDENT_BYTES = 1024
+# apply_parameter: args tuple and kwargs dict of each call
+APPLY_PARAMETER_PEAK_BYTES = 512
+APPLY_PARAMETER_BLOCKS = 4
+APPLY_PARAMETER_BYTES = 256
+# solve_dependencies: memory used by a node, including what it frees
+SOLVE_NODE_PEAK_BYTES = 3072
+# solve_dependencies: memory used by each node while the graph is resolved
+SOLVE_PEAK_BYTES = 512
+SOLVE_BLOCKS = 2
+SOLVE_BYTES = 192
+# solve_dependencies: frames of each level of a chain of dependencies
+SOLVE_DEPTH_PEAK_BYTES = 1536
+
+FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+async def leaf(value):
+    return value
+
+
+def sync_leaf(value):
+    return value
+
+
+def make_call(width: int, dependency: Callable[..., Any] = leaf) -> Callable:
+    """root(v0=Depends(dependency), ..., v{width-1}=Depends(dependency))"""
+
+    def root(**values):
+        return len(values)
+
+    root.__signature__ = inspect.Signature(  # type: ignore
+        [
+            inspect.Parameter(
+                f"v{i}",
+                inspect.Parameter.KEYWORD_ONLY,
+                annotation=Annotated[int, Depends(dependency)],
+            )
+            for i in range(width)
+        ]
+    )
+    return root
+
+
+@pytest.fixture
+def traced() -> Iterator[None]:
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        tracemalloc.stop()
+
+
+def snapshot() -> tracemalloc.Snapshot:
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(FILTERS)
+
+
+def diff(after: tracemalloc.Snapshot, before: tracemalloc.Snapshot) -> Tuple[int, int]:
+    stats = after.compare_to(before, "filename")
+    return sum(s.count_diff for s in stats), sum(s.size_diff for s in stats)
+
+
+def per_node(small: Tuple[int, int], large: Tuple[int, int]) -> Tuple[float, float]:
+    nodes = LARGE - SMALL
+    return (large[0] - small[0]) / nodes, (large[1] - small[1]) / nodes
+
+
+def peak(run: Callable[[], Any]) -> int:
+    """traced peak of run above the memory in use before it"""
+
+    def once() -> int:
+        gc.collect()
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        run()
+        return tracemalloc.get_traced_memory()[1] - start
+
+    return int(statistics.median(once() for _ in range(REPEATS)))
+
+
+class Window:
+    """traced peak of the nodes resolved between the start and stop dependencies
+
+    The fixed costs of a resolution may peak higher than its nodes, they are
+    left out of the window.
+    """
+
+    def __init__(self) -> None:
+        self.started = 0
+        self.peaks: List[int] = []
+
+    async def start(self) -> None:
+        gc.collect()
+        tracemalloc.reset_peak()
+        self.started, _ = tracemalloc.get_traced_memory()
+
+    async def stop(self) -> None:
+        self.peaks.append(tracemalloc.get_traced_memory()[1] - self.started)
+
+    async def peak(self, dependencies: List[Dependent]) -> int:
+        self.peaks = []
+        # the first run warms up the signatures
+        for _ in range(REPEATS + 1):
+            graph = Dependent(
+                dict,
+                dependencies=[
+                    Dependent(self.start, name="start"),
+                    *dependencies,
+                    Dependent(self.stop, name="stop"),
+                ],
+            )
+            await solve_dependent(graph, value=1)
+        return int(statistics.median(self.peaks[1:]))
+
+
+def peak_per_node(measure: Callable[[int], int]) -> float:
+    """peak of the first node, or of each node of a larger graph if higher"""
+    first = measure(1) - measure(0)
+    return max(first, (measure(LARGE) - measure(SMALL)) / (LARGE - SMALL))
+
+
+async def async_per_node(measure: Callable[[int], Awaitable[int]]) -> float:
+    return (await measure(LARGE) - await measure(SMALL)) / (LARGE - SMALL)
+
+
+def test_dependent_budget(traced):
+    def measure_peak(width: int) -> int:
+        call = make_call(width)
+        get_dependent(call)  # warm up
+        return peak(lambda: get_dependent(call))
+
+    assert peak_per_node(measure_peak) <= DEPENDENT_PEAK_BYTES
+
+    def measure(width: int) -> Tuple[int, int]:
+        call = make_call(width)
+        get_dependent(call)  # warm up
+        before = snapshot()
+        dependent = get_dependent(call)  # noqa: F841
+        return diff(snapshot(), before)
+
+    blocks, size = per_node(measure(SMALL), measure(LARGE))
+    assert blocks <= DEPENDENT_BLOCKS
+    assert size <= DEPENDENT_BYTES
+
+
+def test_apply_parameter_budget(traced):
+    dependent = Dependent(leaf, name="value")
+    namespace: Dict[str, Any] = {"value": 1}
+    apply_parameter(dependent, {}, namespace)  # warm up the signature
+
+    def measure_peak(calls: int) -> int:
+        return peak(
+            lambda: [apply_parameter(dependent, {}, namespace) for _ in range(calls)]
+        )
+
+    assert peak_per_node(measure_peak) <= APPLY_PARAMETER_PEAK_BYTES
+
+    def measure(calls: int) -> Tuple[int, int]:
+        before = snapshot()
+        results = [apply_parameter(dependent, {}, namespace) for _ in range(calls)]
+        after = snapshot()
+        del results
+        return diff(after, before)
+
+    blocks, size = per_node(measure(SMALL), measure(LARGE))
+    assert blocks <= APPLY_PARAMETER_BLOCKS
+    assert size <= APPLY_PARAMETER_BYTES
+
+
+@pytest.mark.anyio
+async def test_solve_dependencies_budget(traced):
+    window = Window()
+    # from the end of start to the call of stop, the path of one node
+    assert await window.peak([]) <= SOLVE_NODE_PEAK_BYTES
+
+    async def measure_peak(width: int) -> int:
+        return await window.peak([Dependent(leaf, name=f"v{i}") for i in range(width)])
+
+    assert await async_per_node(measure_peak) <= SOLVE_PEAK_BYTES
+
+    async def measure_depth_peak(depth: int) -> int:
+        dependent = Dependent(leaf, name="value")
+        for i in range(depth - 1):
+            dependent = Dependent(dict, name=f"c{i}", dependencies=[dependent])
+        return await window.peak([dependent])
+
+    assert await async_per_node(measure_depth_peak) <= SOLVE_DEPTH_PEAK_BYTES
+
+    snapshots = {}
+
+    async def measure(width: int) -> Tuple[int, int]:
+        async def last(value):
+            # every other node is resolved and still referenced by the resolution
+            snapshots["last"] = snapshot()
+            return value
+
+        dependencies = [Dependent(leaf, name=f"v{i}") for i in range(width - 1)]
+        dependencies.append(Dependent(last, name="last"))
+        # signatures are cached by the first resolution, see test_dependent_budget
+        await solve_dependent(Dependent(dict, dependencies=dependencies[:]), value=1)
+        graph = Dependent(dict, dependencies=dependencies)
+        before = snapshot()
+        await solve_dependent(graph, value=1)
+        return diff(snapshots["last"], before)
+
+    await measure(SMALL)  # warm up
+    blocks, size = per_node(await measure(SMALL), await measure(LARGE))
+    assert blocks <= SOLVE_BLOCKS
+    assert size <= SOLVE_BYTES
+
+
+@pytest.mark.anyio
+async def test_thread_hops(monkeypatch):
+    hops = []
+    run_sync = core.run_sync
+
+    async def counted(*args, **kwargs):
+        hops.append(args[0])
+        return await run_sync(*args, **kwargs)
+
+    monkeypatch.setattr(core, "run_sync", counted)
+
+    # one hop per sync node, none for the async ones
+    assert await solve_dependent(make_call(SMALL), value=1) == SMALL
+    assert len(hops) == 1
+    hops.clear()
+    assert await solve_dependent(make_call(SMALL, sync_leaf), value=1) == SMALL
+    assert len(hops) == SMALL + 1
+
+
+class Functor:
+    async def __call__(self, value):
+        return value
+
+
+@pytest.mark.anyio
+async def test_signature_calls(monkeypatch):
+    calls = []
+    from_callable = inspect.Signature.from_callable.__func__  # type: ignore
+
+    def counted(cls, obj, **kwargs):
+        calls.append(obj)
+        return from_callable(cls, obj, **kwargs)
+
+    await solve_dependent(make_call(SMALL), value=1)  # warm up lazy imports
+    # inspect.signature and the functors of get_functor_signature use it
+    monkeypatch.setattr(inspect.Signature, "from_callable", classmethod(counted))
+
+    # once per node: the root and its dependencies
+    await solve_dependent(make_call(SMALL), value=1)
+    assert len(calls) == SMALL + 1
+    calls.clear()
+    await solve_dependent(make_call(SMALL, Functor()), value=1)
+    assert len(calls) == SMALL + 1
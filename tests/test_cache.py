@@ -0,0 +1,296 @@
+import multiprocessing
+import sys
+import time
+from typing import Annotated
+
+import anyio
+import pytest
+
+from dependencies import Depends, solve_dependent
+from dependencies.cache import SharedCache, stable_key
+
+
+# the keys of a shared cache are module level functions
+calls = []
+
+
+def get_config():
+    return {"debug": True}
+
+
+def parse_config():
+    calls.append("parse")
+    return {"debug": True}
+
+
+def parse_config_sync():
+    calls.append("parse")
+    time.sleep(0.01)
+    return {"debug": True}
+
+
+async def slow():
+    await anyio.sleep(1)
+    return "slow"  # pragma: no cover
+
+
+def make_loader(name):
+    def load():
+        return f"{name}.toml"
+
+    return load
+
+
+class Loader:
+    def __init__(self, name):
+        self.name = name
+
+    def load(self):
+        return self.name  # pragma: no cover
+
+    @classmethod
+    def default(cls):
+        return "default"  # pragma: no cover
+
+
+class Renamed:
+    pass
+
+
+def fill_in_child(path, key=("key",), value=(1, 2, 3)):
+    async def factory():
+        return value
+
+    with SharedCache(path) as cache:
+        anyio.run(cache.fill, key, factory)
+
+
+def run_in_child(path, *args):
+    process = multiprocessing.get_context("spawn").Process(
+        target=fill_in_child, args=(path, *args)
+    )
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+
+@pytest.mark.anyio
+async def test_shared_cache(tmp_path):
+    calls.clear()
+    with SharedCache(str(tmp_path / "cache")) as cache:
+
+        def get_debug(config: Annotated[dict, Depends(parse_config, cache=cache)]):
+            return config["debug"]
+
+        assert await solve_dependent(get_debug) is True
+        assert await solve_dependent(get_debug) is True
+        assert calls == ["parse"]
+
+    # reopened by another worker
+    with SharedCache(str(tmp_path / "cache"), capacity=1) as other:
+        assert other.capacity == 64 * 1024 * 1024
+
+        def get_other(config: Annotated[dict, Depends(parse_config, cache=other)]):
+            return config["debug"]
+
+        assert await solve_dependent(get_other) is True
+        assert calls == ["parse"]
+
+
+@pytest.mark.anyio
+async def test_single_flight(tmp_path):
+    count = 0
+
+    async def factory():
+        nonlocal count
+        count += 1
+        await anyio.sleep(0.01)
+        return count
+
+    results = []
+    with SharedCache(str(tmp_path / "cache")) as cache:
+
+        async def fill():
+            results.append(await cache.fill("key", factory))
+
+        async with anyio.create_task_group() as tg:
+            for _ in range(5):
+                tg.start_soon(fill)
+    assert count == 1
+    assert results == [1] * 5
+
+
+@pytest.mark.anyio
+async def test_single_flight_sync(tmp_path):
+    calls.clear()
+    with SharedCache(str(tmp_path / "cache")) as cache:
+
+        def get_debug(
+            config: Annotated[dict, Depends(parse_config_sync, cache=cache)],
+        ):
+            return config["debug"]
+
+        # more waiters than threads in the default limiter
+        results = []
+
+        async def solve():
+            results.append(await solve_dependent(get_debug))
+
+        with anyio.fail_after(5):
+            async with anyio.create_task_group() as tg:
+                for _ in range(60):
+                    tg.start_soon(solve)
+    assert calls == ["parse"]
+    assert results == [True] * 60
+
+
+@pytest.mark.anyio
+async def test_nested_fill(tmp_path):
+    with SharedCache(str(tmp_path / "cache"), slots=8) as cache:
+
+        async def inner():
+            return "inner"
+
+        async def outer():
+            # a single set: every key shares it
+            return await cache.fill("inner", inner) + ":outer"
+
+        with anyio.fail_after(5):
+            assert await cache.fill("outer", outer) == "inner:outer"
+
+
+@pytest.mark.anyio
+async def test_fill_timeout(tmp_path):
+    with SharedCache(str(tmp_path / "cache")) as cache:
+
+        def get_value(
+            value: Annotated[
+                str,
+                Depends(
+                    slow,
+                    cache=cache,
+                    timeout=0.05,
+                    on_timeout="default",
+                    default="default",
+                ),
+            ],
+        ):
+            return value
+
+        async with anyio.create_task_group() as tg:
+            # holds the fill of the key
+            tg.start_soon(cache.fill, (slow, "value"), slow)
+            await anyio.sleep(0.01)
+            with anyio.fail_after(0.5):
+                assert await solve_dependent(get_value) == "default"
+            tg.cancel_scope.cancel()
+
+
+@pytest.mark.anyio
+async def test_eviction(tmp_path):
+    async def factory():
+        return b"x" * 40
+
+    with SharedCache(str(tmp_path / "cache"), capacity=100, slots=8) as cache:
+        # the same type on a miss and on a hit
+        assert await cache.fill("a", factory) == b"x" * 40
+        assert await cache.fill("a", factory) == b"x" * 40
+
+        await cache.fill("b", factory)
+        assert cache.lookup(stable_key("a"))[0]
+        # the ring buffer wraps around and overwrites "a"
+        await cache.fill("c", factory)
+        assert not cache.lookup(stable_key("a"))[0]
+        assert cache.lookup(stable_key("b"))[0]
+        assert cache.lookup(stable_key("c"))[0]
+
+
+@pytest.mark.anyio
+async def test_view(tmp_path):
+    async def factory():
+        return b"x" * 40
+
+    with SharedCache(str(tmp_path / "cache"), capacity=100, slots=8) as cache:
+        await cache.fill("a", factory)
+        await cache.fill("b", factory)
+        with cache.view("missing") as data:
+            assert data is None
+            # the table is not locked while the block runs
+            with anyio.fail_after(5):
+                assert await cache.fill("b", factory) == b"x" * 40
+        with cache.view("a") as data:
+            assert isinstance(data, memoryview) and data.readonly
+            assert data == b"x" * 40
+            # "c" would overwrite the viewed "a", it is not stored
+            assert await cache.fill("c", factory) == b"x" * 40
+            assert not cache.lookup(stable_key("c"))[0]
+            assert data == b"x" * 40
+        await cache.fill("c", factory)
+        assert cache.lookup(stable_key("c"))[0]
+
+        async def pickled():
+            return {"a": 1}
+
+        await cache.fill("d", pickled)
+        with pytest.raises(TypeError):
+            with cache.view("d"):
+                pass  # pragma: no cover
+
+
+def test_cross_process(tmp_path):
+    path = str(tmp_path / "cache")
+    run_in_child(path)
+
+    with SharedCache(path) as cache:
+        assert cache.lookup(stable_key(("key",))) == (True, (1, 2, 3))
+
+
+@pytest.mark.anyio
+async def test_cross_process_view(tmp_path):
+    async def factory():
+        return b"x" * 40
+
+    path = str(tmp_path / "cache")
+    with SharedCache(path, capacity=100, slots=8) as cache:
+        await cache.fill("a", factory)
+        await cache.fill("b", factory)
+        with cache.view("a") as data:
+            # another worker doesn't overwrite the viewed range
+            run_in_child(path, "c", b"y" * 40)
+            assert data == b"x" * 40
+            assert not cache.lookup(stable_key("c"))[0]
+        run_in_child(path, "c", b"y" * 40)
+        assert cache.lookup(stable_key("c")) == (True, b"y" * 40)
+
+
+def test_stable_key():
+    assert stable_key((get_config, "config")) == stable_key((get_config, "config"))
+    assert stable_key((get_config, "config")) != stable_key((get_config, "other"))
+
+    with pytest.raises(TypeError):
+        stable_key((make_loader("a"), "config"))
+    with pytest.raises(TypeError):
+        stable_key((lambda: None, "config"))
+    with pytest.raises(TypeError):
+        stable_key((Loader("A").load, "config"))
+    with pytest.raises(TypeError):
+        stable_key((Loader("A"), "config"))
+    assert stable_key((Loader.default, "config")) == stable_key(
+        (Loader.default, "config")
+    )
+
+
+@pytest.mark.anyio
+async def test_unpickling_error(tmp_path, monkeypatch):
+    async def renamed():
+        return Renamed()
+
+    async def fresh():
+        return "fresh"
+
+    with SharedCache(str(tmp_path / "cache")) as cache:
+        await cache.fill("key", renamed)
+        # stored by a previous deploy
+        monkeypatch.delattr(sys.modules[__name__], "Renamed")
+        assert await cache.fill("key", fresh) == "fresh"
+        assert cache.lookup(stable_key("key")) == (True, "fresh")
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Annotated
+
+import anyio
+import pytest
+
+from dependencies import Depends, builder, decorator, solve_dependent
+
+events = []
+
+
+def get_session():
+    events.append("open")
+    yield "session"
+    events.append("close")
+
+
+@decorator
+async def create_user(
+    name: str, session: Annotated[str, Depends(get_session, use_cache=True)]
+):
+    return f"{session}:{name}"
+
+
+@builder(share_context=False)
+async def create_isolated_user(
+    name: str, session: Annotated[str, Depends(get_session, use_cache=True)]
+):
+    return f"{session}:{name}"
+
+
+async def get_users(
+    names, session: Annotated[str, Depends(get_session, use_cache=True)]
+):
+    return [await create_user(name=name) for name in names]
+
+
+async def get_isolated_users(
+    names, session: Annotated[str, Depends(get_session, use_cache=True)]
+):
+    return [await create_isolated_user(name=name) for name in names]
+
+
+@decorator
+async def list_users(users: Annotated[list, Depends(get_users)]):
+    return users
+
+
+@decorator
+async def list_isolated_users(users: Annotated[list, Depends(get_isolated_users)]):
+    return users
+
+
+@pytest.mark.anyio
+async def test_shared_context():
+    events.clear()
+    users = await list_users(names=["Tom", "Bob"])
+    assert users == ["session:Tom", "session:Bob"]
+    # the nested calls reuse the cached session and close it with the outer stack
+    assert events == ["open", "close"]
+
+
+@pytest.mark.anyio
+async def test_isolated_context():
+    events.clear()
+    users = await list_isolated_users(names=["Tom", "Bob"])
+    assert users == ["session:Tom", "session:Bob"]
+    assert events == ["open", "open", "close", "open", "close", "close"]
+
+
+def upper(name: str):
+    return name.upper()
+
+
+@decorator
+async def greet(name: str, upper: Annotated[str, Depends(upper, use_cache=True)]):
+    return upper
+
+
+async def get_greetings(names, upper: Annotated[str, Depends(upper, use_cache=True)]):
+    return [await greet(name=name) for name in names]
+
+
+@pytest.mark.anyio
+async def test_nested_inputs():
+    # the cached values are reused only with the same inputs
+    greetings = await solve_dependent(get_greetings, names=["a", "b"], name="a")
+    assert greetings == ["A", "B"]
+
+
+@pytest.mark.anyio
+async def test_exited_context():
+    async def later():
+        await anyio.sleep(0.01)
+        return await create_user(name="Tom")
+
+    async def handler():
+        # outlives the resolution of handler
+        return asyncio.create_task(later())
+
+    events.clear()
+    task = await solve_dependent(handler)
+    assert await task == "session:Tom"
+    assert events == ["open", "close"]
+
+
+@pytest.mark.anyio
+async def test_share_context_namespace():
+    async def get_value(share_context):
+        return share_context
+
+    assert await solve_dependent(get_value, share_context=1) == 1
@@ -0,0 +1,147 @@
+import asyncio
+from typing import Annotated, Optional
+
+import anyio
+import pytest
+
+from dependencies import DependencyTimeout, Depends, IncrementalSession, decorator
+
+calls = []
+events = []
+
+
+def get_config(path):
+    calls.append("config")
+    return {"path": path, "scale": 2}
+
+
+def get_connection(config: Annotated[dict, Depends(get_config)]):
+    calls.append("connection")
+    events.append("open")
+    yield config["path"]
+    events.append("close")
+
+
+def get_parsed(event):
+    calls.append("parsed")
+    return event * 1
+
+
+async def process(
+    connection: Annotated[str, Depends(get_connection)],
+    parsed: Annotated[int, Depends(get_parsed)],
+    config: Annotated[dict, Depends(get_config)],
+):
+    calls.append("process")
+    return f"{connection}:{parsed * config['scale']}"
+
+
+@pytest.mark.anyio
+async def test_incremental_session():
+    calls.clear()
+    events.clear()
+    async with IncrementalSession(process) as session:
+        assert await session.solve(path="db", event=1) == "db:2"
+        assert calls == ["config", "connection", "parsed", "config", "process"]
+
+        # only the nodes reading event are recomputed
+        calls.clear()
+        assert await session.solve(path="db", event=2) == "db:4"
+        assert calls == ["parsed", "process"]
+        assert [dependent.name for dependent in session.recomputed] == [
+            "parsed",
+            "result",
+        ]
+        assert events == ["open"]
+
+        # nothing changed
+        calls.clear()
+        assert await session.solve(path="db", event=2) == "db:4"
+        assert calls == []
+
+        # the generator is torn down and recreated when invalidated
+        calls.clear()
+        assert await session.solve(path="other", event=2) == "other:4"
+        assert calls == ["config", "connection", "config", "process"]
+        assert events == ["open", "close", "open"]
+    assert events == ["open", "close", "open", "close"]
+
+
+def get_session():
+    events.append("open")
+    yield "session"
+    events.append("close")
+
+
+@decorator
+async def create_user(
+    name: str, session: Annotated[str, Depends(get_session, use_cache=True)]
+):
+    return f"{session}:{name}"
+
+
+async def get_user(
+    name: str, session: Annotated[str, Depends(get_session, use_cache=True)]
+):
+    return await create_user(name=name)
+
+
+@pytest.mark.anyio
+async def test_incremental_nested():
+    events.clear()
+    async with IncrementalSession(get_user) as session:
+        assert await session.solve(name="Tom") == "session:Tom"
+        # the nested call reuses the cached session and keeps it with the node
+        assert events == ["open"]
+        assert await session.solve(name="Bob") == "session:Bob"
+        assert events == ["open"]
+    assert events == ["open", "close"]
+
+    async def later(name):
+        await anyio.sleep(0.01)
+        return await create_user(name=name)
+
+    async def spawn(name):
+        return asyncio.create_task(later(name))
+
+    events.clear()
+    async with IncrementalSession(spawn) as session:
+        task = await session.solve(name="Tom")
+    # started after the node was torn down, on its own stack
+    assert await task == "session:Tom"
+    assert events == ["open", "close"]
+
+
+@pytest.mark.anyio
+async def test_incremental_timeout():
+    delays = [0.5, 0]
+
+    async def fetch():
+        await anyio.sleep(delays.pop(0))
+        return "fetched"
+
+    async def get_value(
+        value: Annotated[
+            Optional[str], Depends(fetch, timeout=0.05, on_timeout="default")
+        ],
+    ):
+        return value
+
+    async def slow():
+        await anyio.sleep(1)
+
+    async with IncrementalSession(get_value) as session:
+        assert await session.solve() is None
+        # the timed out node is not reused
+        assert await session.solve() == "fetched"
+
+    async with IncrementalSession(slow) as session:
+        with pytest.raises(DependencyTimeout):
+            await session.solve(_timeout=0.01)
+
+    async def get_timeout(timeout):
+        return timeout
+
+    # timeout is a value of the namespace, not the budget
+    async with IncrementalSession(get_timeout) as session:
+        assert await session.solve(timeout=3) == 3
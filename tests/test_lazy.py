@@ -0,0 +1,101 @@
+from typing import Annotated
+
+import pytest
+
+from dependencies import Depends, Lazy, solve_dependent
+
+
+@pytest.mark.anyio
+async def test_lazy():
+    calls = []
+
+    def get_logger(prefix):
+        calls.append(prefix)
+        return prefix + ":"
+
+    async def audit(rare: bool, logger: Annotated[Lazy[str], Depends(get_logger)]):
+        if rare:
+            return (await logger) + (await logger())
+        return None
+
+    assert await solve_dependent(audit, rare=False, prefix="audit") is None
+    assert calls == []
+
+    assert await solve_dependent(audit, rare=True, prefix="audit") == "audit:audit:"
+    assert calls == ["audit"]
+
+
+@pytest.mark.anyio
+async def test_lazy_cache():
+    count = 0
+
+    def get_value():
+        nonlocal count
+        count += 1
+        return count
+
+    def eager(value: Annotated[int, Depends(get_value, use_cache=True)]):
+        return value
+
+    async def consumer(
+        eager: Annotated[int, Depends(eager)],
+        value: Annotated[Lazy[int], Depends(get_value, use_cache=True)],
+    ):
+        return eager, await value
+
+    assert await solve_dependent(consumer) == (1, 1)
+    assert count == 1
+
+
+@pytest.mark.anyio
+async def test_lazy_generator():
+    events = []
+
+    def get_connection():
+        events.append("open")
+        yield "connection"
+        events.append("close")
+
+    async def query(connection: Lazy[str] = Depends(get_connection)):
+        events.append("query")
+        return await connection
+
+    assert await solve_dependent(query) == "connection"
+    assert events == ["query", "open", "close"]
+
+
+@pytest.mark.anyio
+async def test_lazy_closed():
+    events = []
+
+    def get_connection():
+        events.append("open")
+        yield "connection"
+        events.append("close")
+
+    def leak(connection: Lazy[str] = Depends(get_connection)):
+        return connection
+
+    connection = await solve_dependent(leak)
+    with pytest.raises(RuntimeError):
+        await connection
+    assert events == []
+
+
+@pytest.mark.anyio
+async def test_lazy_namespace():
+    def get_value():
+        return 1
+
+    def sibling(value=None):
+        return value
+
+    def consumer(
+        value: Annotated[Lazy[int], Depends(get_value)],
+        other: Annotated[int, Depends(sibling)],
+    ):
+        return other
+
+    # the handle is not visible to the sibling reading `value`
+    assert await solve_dependent(consumer) is None
+    assert await solve_dependent(consumer, value=2) == 2
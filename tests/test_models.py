@@ -0,0 +1,141 @@
+import subprocess
+import sys
+from typing import Annotated, List, NotRequired, TypedDict
+
+import pytest
+
+from dependencies import Depends, solve_dependent
+from dependencies import models
+
+pydantic = pytest.importorskip("pydantic")
+
+
+class User(pydantic.BaseModel):
+    name: str
+    score: int
+
+
+class Point(TypedDict):
+    x: int
+    y: int
+    label: NotRequired[str]
+
+
+@pytest.mark.anyio
+async def test_model(monkeypatch):
+    def run_sync(*args, **kwargs):  # pragma: no cover
+        raise AssertionError("small input must be validated inline")
+
+    monkeypatch.setattr(models, "run_sync", run_sync)
+
+    def get_user(user: Annotated[User, Depends()]):
+        return user
+
+    user = await solve_dependent(get_user, name="Tom", score="90")
+    assert user == User(name="Tom", score=90)
+
+    with pytest.raises(pydantic.ValidationError):
+        await solve_dependent(get_user, name="Tom", score="high")
+
+
+@pytest.mark.anyio
+async def test_model_list(monkeypatch):
+    calls = []
+
+    async def run_sync(func, *args):
+        calls.append(len(args[0]))
+        return func(*args)
+
+    monkeypatch.setattr(models, "run_sync", run_sync)
+
+    def get_users(users: Annotated[List[User], Depends()]):
+        return users
+
+    users = [{"name": "Tom", "score": 90}, {"name": "Bob", "score": 80}]
+    assert await solve_dependent(get_users, users=users) == [
+        User(**user) for user in users
+    ]
+    assert calls == []
+
+    users = [{"name": str(i), "score": i} for i in range(100)]
+    result = await solve_dependent(get_users, users=users)
+    assert [user.score for user in result] == list(range(100))
+    assert calls == [100]
+
+
+@pytest.mark.anyio
+async def test_model_list_revalidate():
+    tom = User(name="Tom", score=90)
+    # built without validation
+    invalid = User.model_construct(name="Eve", score="high")
+
+    def get_users(users: Annotated[List[User], Depends(revalidate=False)]):
+        return users
+
+    def get_revalidated(users: Annotated[List[User], Depends()]):
+        return users
+
+    users = await solve_dependent(
+        get_users, users=[tom, invalid, {"name": "Bob", "score": "80"}]
+    )
+    assert users[0] is tom
+    assert users[1] is invalid
+    assert users[2] == User(name="Bob", score=80)
+
+    users = await solve_dependent(get_revalidated, users=[tom])
+    assert users == [tom] and users[0] is not tom
+    with pytest.raises(pydantic.ValidationError):
+        await solve_dependent(get_revalidated, users=[tom, invalid])
+
+
+@pytest.mark.anyio
+async def test_typeddict():
+    def get_point(point: Annotated[Point, Depends()]):
+        return point
+
+    def get_points(points: Annotated[List[Point], Depends()]):
+        return points
+
+    point = await solve_dependent(get_point, x="1", y=2, label="a")
+    assert point == {"x": 1, "y": 2, "label": "a"}
+    with pytest.raises(pydantic.ValidationError):
+        await solve_dependent(get_point, x="not-an-int", y=2, label="a")
+
+    points = [{"x": "1", "y": 2, "label": "a"}, {"x": 3, "y": 4}]
+    assert await solve_dependent(get_points, points=points) == [
+        {"x": 1, "y": 2, "label": "a"},
+        {"x": 3, "y": 4},
+    ]
+    with pytest.raises(pydantic.ValidationError):
+        await solve_dependent(get_points, points=[{"x": 1}])
+
+
+@pytest.mark.anyio
+async def test_typing_extensions_typeddict():
+    typing_extensions = pytest.importorskip("typing_extensions")
+
+    class Size(typing_extensions.TypedDict):
+        width: int
+
+    def get_size(size: Annotated[Size, Depends()]):
+        return size
+
+    assert await solve_dependent(get_size, width="3") == {"width": 3}
+
+
+def test_lazy_pydantic():
+    code = "import sys, dependencies; assert 'pydantic' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_type_adapter_cache():
+    assert models.get_model_adapter(User) is models.get_model_adapter(User)
+    assert models.get_model_adapter(dict) is None
+
+    class Custom(pydantic.BaseModel):
+        name: str
+
+        def __init__(self, name: str) -> None:
+            super().__init__(name=name)
+
+    assert models.get_model_adapter(Custom) is None
@@ -0,0 +1,101 @@
+import time
+from typing import Annotated, Optional
+
+import anyio
+import pytest
+
+from dependencies import DependencyTimeout, Depends, Hedge, decorator
+from dependencies.profile import main, profile
+
+
+def get_values(values):
+    time.sleep(0.001)
+    return values
+
+
+async def get_length(values: Annotated[tuple, Depends(get_values, use_cache=True)]):
+    return len(values) or 1
+
+
+async def get_sum(values: Annotated[tuple, Depends(get_values, use_cache=True)]):
+    return sum(values)
+
+
+@decorator
+async def get_avg(
+    sum: Annotated[int, Depends(get_sum)],
+    length: Annotated[int, Depends(get_length)],
+):
+    return sum / length
+
+
+@pytest.mark.anyio
+async def test_profile():
+    profiler = await profile(get_avg, iterations=5, namespace={"values": (1, 2, 3)})
+    nodes = {stats.path: stats for stats in profiler.ordered()}
+
+    root = ("get_avg",)
+    assert list(nodes) == [
+        root,
+        root + ("sum=get_sum",),
+        root + ("sum=get_sum", "values=get_values"),
+        root + ("length=get_length",),
+        root + ("length=get_length", "values=get_values"),
+    ]
+    assert nodes[root].calls == 5
+
+    # resolved once per iteration in a thread, then cached
+    first = nodes[root + ("sum=get_sum", "values=get_values")]
+    assert first.calls == 5 and first.hit_rate == 0
+    assert len(first.runs) == 5 and first.run >= 0.001
+    second = nodes[root + ("length=get_length", "values=get_values")]
+    assert second.calls == 5 and second.hit_rate == 1
+
+    path, critical = profiler.critical_path()
+    assert path[:2] == [root, root + ("sum=get_sum",)]
+    assert critical <= profiler.sequential()
+    assert profiler.speedup() >= 1
+
+
+@pytest.mark.anyio
+async def test_profile_options():
+    async def slow():
+        await anyio.sleep(1)
+
+    async def get_value(
+        value: Annotated[Optional[int], Depends(slow, on_timeout="default")],
+    ):
+        return value
+
+    wrapped = decorator(get_value, timeout=0.01)
+    assert wrapped.__wrapped__ is get_value and wrapped.__name__ == "get_value"
+    # resolved with the budget of the wrapper, spent by slow
+    with anyio.fail_after(0.5), pytest.raises(DependencyTimeout):
+        await profile(wrapped, iterations=2)
+
+    delays = [0.01, 1, 0.01]
+
+    async def fetch():
+        await anyio.sleep(delays.pop(0))
+        return 1
+
+    async def get_price(
+        price: Annotated[int, Depends(fetch, hedge=Hedge(min_samples=1))],
+    ):
+        return price
+
+    # the second call is hedged, its two attempts are one call
+    profiler = await profile(get_price, iterations=2)
+    assert delays == []
+    nodes = {stats.path: stats for stats in profiler.ordered()}
+    assert nodes[("get_price", "price=fetch")].calls == 2
+
+
+def test_main(capsys):
+    main(["tests.test_profile:get_avg", "-n", "3", "--kw", "values=(1, 2, 3)"])
+    out = capsys.readouterr().out
+    assert "get_avg " in out
+    assert "critical path: get_avg -> sum=get_sum -> values=get_values" in out
+
+    with pytest.raises(SystemExit):
+        main(["tests.test_profile", "--kw", "values"])
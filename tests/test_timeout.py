@@ -0,0 +1,105 @@
+import time
+from typing import Annotated, Optional
+
+import anyio
+import pytest
+
+from dependencies import DependencyTimeout, Depends, Hedge, decorator, solve_dependent
+
+
+@pytest.mark.anyio
+async def test_timeout_default():
+    def slow_sync():
+        time.sleep(0.5)
+        return "slow"
+
+    def get_value(
+        value: Annotated[
+            Optional[str],
+            Depends(slow_sync, timeout=0.05, on_timeout="default", default="fast"),
+        ],
+    ):
+        return value
+
+    started = time.perf_counter()
+    assert await solve_dependent(get_value) == "fast"
+    # the thread is abandoned
+    assert time.perf_counter() - started < 0.4
+
+
+@pytest.mark.anyio
+async def test_timeout_raise():
+    async def slow():
+        await anyio.sleep(1)
+
+    def get_value(value=Depends(slow, timeout=0.01)):
+        return value  # pragma: no cover
+
+    with pytest.raises(DependencyTimeout, match="value timed out"):
+        await solve_dependent(get_value)
+
+    with pytest.raises(ValueError):
+        Depends(slow, on_timeout="ignore")  # type: ignore
+
+
+@pytest.mark.anyio
+async def test_deadline():
+    started = []
+
+    async def first():
+        await anyio.sleep(0.05)
+        return 1
+
+    async def second():
+        started.append("second")  # pragma: no cover
+
+    def get_values(
+        a: Annotated[Optional[int], Depends(first, on_timeout="default")],
+        b: Annotated[Optional[int], Depends(second, on_timeout="default", default=0)],
+    ):
+        return a, b  # pragma: no cover
+
+    # the budget is spent by first, second never starts and the result times out
+    with pytest.raises(DependencyTimeout):
+        await solve_dependent(get_values, _timeout=0.02)
+    assert started == []
+
+    assert await solve_dependent(get_values, _timeout=1) == (1, None)
+
+
+@pytest.mark.anyio
+async def test_hedge():
+    hedge = Hedge(min_samples=3)
+    attempts = 0
+
+    async def fetch():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 4:
+            # the first attempt of the hedged call is stuck
+            await anyio.sleep(10)
+        else:
+            await anyio.sleep(0.01)
+        return attempts
+
+    def get_value(value: Annotated[int, Depends(fetch, hedge=hedge)]):
+        return value
+
+    for _ in range(3):
+        await solve_dependent(get_value)
+    assert hedge.delay is not None
+
+    started = time.perf_counter()
+    assert await solve_dependent(get_value) == 5
+    assert time.perf_counter() - started < 1
+
+
+@pytest.mark.anyio
+async def test_timeout_namespace():
+    async def fetch(url, timeout):
+        return url, timeout
+
+    # timeout is a value of the namespace, not the budget
+    assert await solve_dependent(fetch, url="u", timeout=3) == ("u", 3)
+    assert await decorator(fetch)(url="u", timeout=3) == ("u", 3)
+    assert await decorator(fetch, timeout=1)(url="u", timeout=3) == ("u", 3)